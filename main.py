@@ -1,14 +1,20 @@
-import time
 import re
 import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse, parse_qs
+import aiohttp
+import orjson
+from selectolax.lexbor import LexborHTMLParser
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from oauth2client.service_account import ServiceAccountCredentials
 import gspread
 
@@ -16,8 +22,179 @@ import gspread
 SERVICE_ACCOUNT_FILE = "credentials.json"
 SHEET_NAME = "yahoo-news-scraper2" # スプレッドシート名を変更
 # シート名はデフォルトで最初のシート（sheet1）が使用されます。
+SHEET_INITIALIZED_FLAG = ".sheet_initialized" # ヘッダー行の挿入済みを記録するローカルファイル
+BODY_MAX_LENGTH = 3000 # スプレッドシートに書き込む本文の最大文字数
+EXISTING_URLS_CACHE = "urls.json" # 書き込み済みURLのキャッシュ (GitHub Actionsのキャッシュで実行間に引き継ぐ)
+
+# --- 並列取得設定 ---
+MAX_CONCURRENT_FETCHES = 10 # 記事ページの同時取得数の上限
+MAX_CATEGORY_WORKERS = 4 # カテゴリページを同時に開くWebDriverの数
+
+# --- リクエスト設定 ---
+# SeleniumとaiohttpのHTTPセッションで共通のUser-Agent
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# --- 正規表現 (記事ごとに使うためモジュール読み込み時に一度だけコンパイル) ---
+_TITLE_SUFFIX_RE = re.compile(r'（.*?） - Yahoo!ニュース$')
+_AUTHOR_META_RE = re.compile("author|publisher", re.I)
+# JSONの文字列リテラル、または波括弧 (文字列中の括弧を数えないよう、文字列は丸ごと読み飛ばす)
+_JSON_STRING_OR_BRACE_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]')
+
+# --- ジャンル設定 ---
+# 主要カテゴリのマッピング辞書
+CATEGORY_MAP = {
+    "dom": "国内",
+    "wor": "国際",
+    "bus": "経済",
+    "eco": "経済",
+    "ent": "エンタメ",
+    "spo": "スポーツ",
+    "it": "IT",
+    "sci": "科学",
+    "life": "ライフ",
+    "loc": "地域",
+    "main": "主要"
+}
+
+# サブカテゴリのマッピング辞書
+SUBCATEGORY_MAP = {
+    "poli": "政治",
+    "soci": "社会",
+    "peo": "人", # 人物
+    "oversea": "国際総合", # URLで oversea が使われている場合
+    "chn": "中国・台湾",
+    "kor": "韓国・北朝鮮",
+    "asia": "アジア・オセアニア",
+    "na": "北米",
+    "ca": "中南米",
+    "eu": "ヨーロッパ",
+    "mea": "中東・アフリカ",
+    "biz": "経済総合", # URLで biz が使われている場合
+    "mkt": "市況",
+    "stk": "株式",
+    "ind": "産業",
+    "mus": "音楽",
+    "mov": "映画",
+    "game": "ゲーム",
+    "korasian": "アジア・韓流",
+    "base": "野球",
+    "soc": "サッカー",
+    "moto": "モータースポーツ",
+    "horse": "競馬",
+    "golf": "ゴルフ",
+    "fig": "格闘技",
+    "health": "ヘルス",
+    "env": "環境",
+    "art": "文化・アート",
+    "tohoku": "北海道・東北",
+    "kant": "関東",
+    "shinetu": "信越・北陸",
+    "tokai": "東海",
+    "kinki": "近畿",
+    "chugoku": "中国",
+    "shikoku": "四国",
+    "kushu": "九州・沖縄",
+    "itpro": "製品", # ITの製品カテゴリ
+    "it総合": "IT総合", # 明示的にIT総合とする場合
+    "sci総合": "科学総合", # 明示的に科学総合とする場合
+    "life総合": "ライフ総合", # 明示的にライフ総合とする場合
+    "ent総合": "エンタメ総合", # 明示的にエンタメ総合とする場合
+    "spo総合": "スポーツ総合", # 明示的にスポーツ総合とする場合
+    "dom総合": "国内総合", # 明示的に国内総合とする場合
+    "wor総合": "国際総合", # 明示的に国際総合とする場合
+    "eco総合": "経済総合", # 明示的に経済総合とする場合
+    "loc総合": "地域総合" # 明示的に地域総合とする場合
+}
+
+# URLに現れる大カテゴリ名（英語のスラッグと短縮名）→ (サブカテゴリ名の接頭辞, 大カテゴリ単体のジャンル)
+# モジュール読み込み時に一度だけ組み立て、URLからのジャンル推定は辞書引きで行う
+_URL_CATEGORY_SLUGS = {
+    "domestic": "dom",
+    "world": "wor",
+    "economy": "eco",
+    "entertainment": "ent",
+    "sports": "spo",
+    "science": "sci",
+    "local": "loc",
+}
+
+def _build_url_category_genre():
+    """
+    URL中の大カテゴリ名から (接頭辞, ジャンル) を引く辞書を作ります。
+    IT・科学・主要の特別扱いはここで適用しておきます。
+    """
+    url_category_genre = {}
+    for short_name, jp_name in CATEGORY_MAP.items():
+        if short_name == "it":
+            url_category_genre[short_name] = ("IT/", "IT")
+        elif short_name == "sci":
+            url_category_genre[short_name] = ("科学/", "科学")
+        elif short_name == "main":
+            url_category_genre[short_name] = ("", "主要")
+        else:
+            url_category_genre[short_name] = (f"{jp_name}/", f"{jp_name}/{jp_name}総合")
+    for slug, short_name in _URL_CATEGORY_SLUGS.items():
+        url_category_genre[slug] = url_category_genre[short_name]
+    return url_category_genre
+
+_URL_CATEGORY_GENRE = _build_url_category_genre()
+
+def infer_genre_from_url(url):
+    """
+    URLのパスの各要素と ctg / genre クエリの値からジャンルを推定します。
+    サブカテゴリが見つかればそれを優先し、大カテゴリも分かる場合は「大カテゴリ/サブカテゴリ」とします。
+    推定できない場合は None を返します。
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    tokens = [segment for segment in parsed.path.split("/") if segment] + query.get("ctg", []) + query.get("genre", [])
+
+    category = None
+    sub_genre = None
+    for token in tokens:
+        if category is None and token in _URL_CATEGORY_GENRE:
+            category = _URL_CATEGORY_GENRE[token]
+        if sub_genre is None and token in SUBCATEGORY_MAP:
+            sub_genre = SUBCATEGORY_MAP[token]
+
+    if sub_genre:
+        return f"{category[0]}{sub_genre}" if category else sub_genre
+    if category:
+        return category[1]
+    return None
+
+# --- スクレイピング対象のカテゴリページ ---
+CATEGORY_URLS = {
+    "国内": "https://news.yahoo.co.jp/categories/domestic",
+    "国際": "https://news.yahoo.co.jp/categories/world",
+    "経済": "https://news.yahoo.co.jp/categories/economy",
+    "エンタメ": "https://news.yahoo.co.jp/categories/entertainment",
+    "スポーツ": "https://news.yahoo.co.jp/categories/sports",
+    "IT": "https://news.yahoo.co.jp/categories/it",
+    "科学": "https://news.yahoo.co.jp/categories/science",
+    "ライフ": "https://news.yahoo.co.jp/categories/life",
+    "地域": "https://news.yahoo.co.jp/categories/local",
+    "主要": "https://news.yahoo.co.jp/"
+}
 
 # --- Selenium設定 ---
+# 抽出に関係しない広告・解析・画像・フォントへのリクエストをCDPでブロックする
+BLOCKED_URL_PATTERNS = [
+    "*doubleclick*",
+    "*analytics*",
+    "*googletagmanager*",
+    "*yimg.jp/images/*",
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.woff*",
+    "*.css",
+]
+# カテゴリページの記事リンク (読み込み完了の待機に使用)
+ARTICLE_LINK_SELECTOR = 'a[href*="/articles/"]'
+
 def init_driver():
     """
     WebDriverを初期化し、ヘッドレスモードでChromeを設定します。
@@ -32,96 +209,367 @@ def init_driver():
     chrome_options.add_argument("--disable-extensions") # 拡張機能を無効化
     chrome_options.add_argument("--proxy-server='direct://'") # プロキシサーバーを直接接続に設定
     chrome_options.add_argument("--proxy-bypass-list=*") # プロキシバイパスリスト
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    # 抽出に不要な画像・CSS・フォント・プラグインを読み込まない
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+        "profile.managed_default_content_settings.plugins": 2,
+    })
+    chrome_options.page_load_strategy = "eager" # DOMContentLoaded の時点で driver.get() から戻る
 
     # GitHub Actions上のChromedriverのパス
     service = Service("/usr/bin/chromedriver")
     driver = webdriver.Chrome(service=service, options=chrome_options)
+    # リクエスト自体を発行させないよう、DevTools Protocolでブロックする
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
     print("[DEBUG] WebDriver initialized.")
     return driver
 
+# --- HTTP取得関数 ---
+async def fetch_html(http_session, semaphore, url):
+    """
+    記事ページのHTMLを非同期に取得します。
+    同時接続数はセマフォで制限し、取得に失敗した場合はNoneを返します。
+    """
+    async with semaphore:
+        try:
+            async with http_session.get(url) as response:
+                response.raise_for_status()
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, LookupError) as e:
+            # 文字コードの不正なページなども含め、1件の失敗が他の記事の取得を巻き込まないようにする
+            print(f"[ERROR] Failed to fetch {url}: {e}")
+            return None
+
+async def fetch_article(http_session, semaphore, url):
+    """
+    記事ページを取得し、取得でき次第 extract_article_info で情報を抽出します。
+    他の記事の通信待ちの間に解析を進めるため、全件の取得完了を待たずに解析します。
+    取得に失敗した場合はNoneを返します。
+    """
+    html = await fetch_html(http_session, semaphore, url)
+    if html is None:
+        return None
+    return extract_article_info(url, html)
+
+async def fetch_all_articles(urls):
+    """
+    複数の記事ページを1つのClientSessionで並行取得し、URLと同じ順序で抽出結果のリストを返します。
+    1件の取得・解析で例外が起きても他の記事は処理を続け、その記事の位置には例外オブジェクトが入ります。
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    timeout = aiohttp.ClientTimeout(total=10)
+    # 取得先はすべて news.yahoo.co.jp のため、同時取得数と同じ数の接続をKeep-Aliveで使い回す
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENT_FETCHES, keepalive_timeout=30)
+    async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}, timeout=timeout, connector=connector) as http_session:
+        return await asyncio.gather(*(fetch_article(http_session, semaphore, url) for url in urls), return_exceptions=True)
+
+# --- カテゴリページ解析関数 ---
+def extract_article_urls(html):
+    """
+    カテゴリページのHTMLから記事URLを抽出します。
+    クエリ文字列を除いたURLを、ページ内の出現順に重複なしで返します。
+    """
+    tree = LexborHTMLParser(html)
+    article_urls = {}
+    for a in tree.css(ARTICLE_LINK_SELECTOR):
+        href = a.attributes.get("href") or ""
+        if href.startswith("https://news.yahoo.co.jp/articles/"):
+            article_urls[href.split("?")[0]] = None
+    return list(article_urls)
+
+# --- 記事ページ前処理関数 ---
+# 記事ページのコメント欄。これ以降はアクセス解析やレコメンド用のスクリプトが大半を占め、抽出には使わない
+# data-testid="comment" のように id="comment" で終わる別の属性に一致しないよう、直前の空白を必須にする
+_COMMENT_SECTION_RE = re.compile(r"""\sid=["']?comment["'\s>]""")
+# 記事本文のコンテナと記事下部の情報源。これらがコメント欄より後ろにある場合は切り捨てない
+ARTICLE_BODY_SELECTOR = "div.sc-54nboa-0"
+ARTICLE_BODY_FALLBACK_SELECTOR = 'div[class*="article_body"], div[class*="ArticleBody"], div[class*="yjSlinkDirectlink"]'
+_EXTRACTION_TARGET_MARKS = ("sc-54nboa-0", "article_body", "ArticleBody", "yjSlinkDirectlink", "sc-f06b9b1-0")
+_PRELOADED_STATE_MARK = 'window.__PRELOADED_STATE__ ='
+
+def trim_article_html(html):
+    """
+    記事ページのHTMLから、抽出に使わないコメント欄以降の部分を切り捨てます。
+    パースする文字数を減らすことで、ツリー構築にかかる時間とメモリを抑えます。
+    __PRELOADED_STATE__ は切り捨て前のHTMLから extract_preloaded_state で取り出すため、ここでは考慮しません。
+    切り捨ては高速化のためだけのもので、抽出結果を変えてはいけません。
+    本文のコンテナや情報源がコメント欄より後ろにある場合は、切り捨てずにそのまま返します。
+    """
+    match = _COMMENT_SECTION_RE.search(html)
+    if not match:
+        return html
+    cut = match.start()
+    if any(mark in html[cut:] for mark in _EXTRACTION_TARGET_MARKS):
+        print("[DEBUG] Article content found after the comment section. Skipping trim.")
+        return html
+    print(f"[DEBUG] Trimmed article HTML from {len(html)} to {cut} chars.")
+    return html[:cut]
+
+def extract_preloaded_state(html):
+    """
+    記事ページのHTML文字列から window.__PRELOADED_STATE__ を含むスクリプトの本文を切り出します。
+    scriptタグをすべてツリー上で走査する代わりに、文字列検索でマーカーの位置から</script>までを返します。
+    見つからない場合はNoneを返します。
+    """
+    start = html.find(_PRELOADED_STATE_MARK)
+    if start == -1:
+        return None
+    end = html.find("</script>", start)
+    return html[start:end] if end != -1 else html[start:]
+
+def find_json_object_end(text, start):
+    """
+    text[start] の '{' に対応する '}' の位置を返します。
+    文字列リテラル内の括弧は数えず、対応する括弧が見つからない場合は -1 を返します。
+    スクリプト末尾に続くコード中の '}' を拾わないよう、rfind ではなく括弧の対応で終端を決めます。
+    """
+    depth = 0
+    for match in _JSON_STRING_OR_BRACE_RE.finditer(text, start):
+        token = match.group()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return match.start()
+    return -1
+
+# --- 記事ページ走査関数 ---
+def scan_article_tree(tree):
+    """
+    記事ページのツリーを1回だけ走査し、メタ情報の抽出に使うノードを集めます。
+    meta・ld+jsonのscript・time を項目ごとに検索する代わりに、1回のCSSクエリの結果を振り分けます。
+    """
+    found = {
+        "og_title": None,        # <meta property="og:title">
+        "author_meta": None,     # nameにauthor/publisherを含む最初の<meta>
+        "pubdate_meta": None,    # <meta name="pubdate">
+        "ld_json_scripts": [],   # <script type="application/ld+json"> (出現順)
+        "time_tag": None,        # 最初の<time>
+    }
+    for node in tree.css('meta, script[type="application/ld+json"], time'):
+        attrs = node.attributes
+        if node.tag == "meta":
+            name = attrs.get("name") or ""
+            if found["og_title"] is None and attrs.get("property") == "og:title":
+                found["og_title"] = node
+            if found["author_meta"] is None and name and _AUTHOR_META_RE.search(name):
+                found["author_meta"] = node
+            if found["pubdate_meta"] is None and name == "pubdate":
+                found["pubdate_meta"] = node
+        elif node.tag == "script":
+            found["ld_json_scripts"].append(node)
+        elif found["time_tag"] is None:
+            found["time_tag"] = node
+    return found
+
+def parse_ld_json(scripts):
+    """
+    ld+jsonのscriptノードをデコードし、辞書のリストを出現順に返します。
+    デコードできないブロックや辞書でないブロックは読み飛ばします。
+    """
+    items = []
+    for script in scripts:
+        try:
+            data = orjson.loads(script.text())
+        except (orjson.JSONDecodeError, ValueError, TypeError) as e:
+            print(f"[DEBUG] Failed to parse ld+json: {e}")
+            continue
+        if isinstance(data, dict):
+            items.append(data)
+    return items
+
+# --- カテゴリページ取得関数 ---
+_thread_local = threading.local()
+_worker_drivers = []
+_worker_drivers_lock = threading.Lock()
+
+def get_worker_driver():
+    """
+    ワーカースレッドごとにWebDriverを1つだけ生成し、同じスレッドが担当する次のカテゴリでも使い回します。
+    WebDriverはインスタンス単位でしかスレッドセーフでないため、スレッド間では共有しません。
+    """
+    driver = getattr(_thread_local, "driver", None)
+    if driver is None:
+        driver = init_driver()
+        _thread_local.driver = driver
+        with _worker_drivers_lock:
+            _worker_drivers.append(driver)
+    return driver
+
+def quit_worker_drivers():
+    """
+    ワーカースレッドで生成したすべてのWebDriverを終了します。
+    """
+    with _worker_drivers_lock:
+        if not _worker_drivers:
+            return
+        while _worker_drivers:
+            driver = _worker_drivers.pop()
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"[ERROR] Failed to quit WebDriver: {e}")
+    print("[INFO] WebDriver closed.")
+
+def scrape_category(category_name, base_url):
+    """
+    カテゴリページを開いて「もっと見る」をクリックし、掲載されている記事URLのリストを返します。
+    ThreadPoolExecutor から並列に呼び出され、失敗した場合は空のリストを返します。
+    """
+    try:
+        driver = get_worker_driver()
+        print(f"\n--- Scraping Category: {category_name} ({base_url}) ---")
+        driver.get(base_url)
+        # 固定時間のsleepではなく、記事リンクが現れた時点で次へ進む
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ARTICLE_LINK_SELECTOR))
+            )
+        except TimeoutException:
+            print(f"[INFO] Article links did not appear within timeout in {category_name}.")
+
+        # 各カテゴリで「もっと見る」のクリック回数を減らす
+        # アカウント停止リスクを減らすため、1回または0回にするのも有効
+        # Yahoo!ニュースは新しい記事が比較的頻繁に出るので、少なめでも良いかも
+        for i in range(1): # 例: 1回だけクリック (デフォルトは3回から変更)
+            try:
+                more_button = WebDriverWait(driver, 5).until(
+                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'もっと見る')]"))
+                )
+                links_before = len(driver.find_elements(By.CSS_SELECTOR, ARTICLE_LINK_SELECTOR))
+                driver.execute_script("arguments[0].click();", more_button)
+                print(f"[DEBUG] Clicked 'もっと見る' button {i+1} times in {category_name}.")
+                # 新しい記事リンクが追加されるまで待つ
+                try:
+                    WebDriverWait(driver, 5).until(
+                        lambda d: len(d.find_elements(By.CSS_SELECTOR, ARTICLE_LINK_SELECTOR)) > links_before
+                    )
+                except TimeoutException:
+                    print(f"[INFO] No additional article links loaded in {category_name}.")
+            except Exception:
+                print(f"[INFO] No more 'もっと見る' button or reached limit in {category_name}.")
+                break
+
+        article_urls = extract_article_urls(driver.page_source)
+        print(f"[DEBUG] Found {len(article_urls)} article links in {category_name}.")
+        return article_urls
+    except Exception as e:
+        print(f"[ERROR] Failed to scrape category {category_name} ({base_url}): {e}")
+        return []
+
 # --- 本文抽出関数 ---
-def extract_body(soup):
+def _paragraph_texts(container):
+    """
+    コンテナ内の各<p>のテキストを一度だけ取り出し、空でないものを順に返すジェネレータです。
+    """
+    for p in container.css("p"):
+        text = p.text(separator=" ", strip=True)
+        if text:
+            yield text
+
+def extract_body(tree):
     """
-    BeautifulSoupオブジェクトから記事の本文を抽出します。
+    selectolaxでパースしたツリーから記事の本文を抽出します。
     不要な要素（画像、広告、スクリプトなど）を除去します。
     """
     # 記事本文のコンテナを検索 (Yahoo!ニュースのクラス名に合わせて調整)
     # 現在のYahoo!ニュースでは `article.sc-54nboa-0` のような構造が多い
-    article_content_div = soup.find("div", class_="sc-54nboa-0")
+    article_content_div = tree.css_first(ARTICLE_BODY_SELECTOR)
     if not article_content_div:
         # 別の可能性のあるセレクタも試す
-        article_content_div = soup.find("div", class_=re.compile(r"article_body|ArticleBody|yjSlinkDirectlink"))
+        article_content_div = tree.css_first(ARTICLE_BODY_FALLBACK_SELECTOR)
 
     if not article_content_div:
         print("[DEBUG] No article content container found.")
         return ""
 
     # 不要なタグを除去
-    for tag in article_content_div.find_all(["figure", "aside", "script", "style", "noscript", "blockquote"]):
+    for tag in article_content_div.css("figure, aside, script, style, noscript, blockquote"):
         tag.decompose()
 
-    # 段落を結合
-    paragraphs = [p.get_text(" ", strip=True) for p in article_content_div.find_all("p") if p.get_text(strip=True)]
-    body = "\n".join(paragraphs)
+    # 段落を結合 (本文はBODY_MAX_LENGTH文字に制限するため、上限に達した時点で以降の段落は読まない)
+    paragraphs = []
+    total_length = 0
+    for text in _paragraph_texts(article_content_div):
+        paragraphs.append(text)
+        total_length += len(text) + 1 # 改行の分
+        if total_length >= BODY_MAX_LENGTH:
+            break
+    body = "\n".join(paragraphs)[:BODY_MAX_LENGTH]
     print(f"[DEBUG] Extracted body part length: {len(body)}")
     return body
 
 # --- 記事情報取得関数 ---
-def extract_article_info(driver, url):
+def extract_article_info(url, html):
     """
-    記事のURLにアクセスし、タイトル、情報源、掲載時刻、本文、ジャンル、IDを抽出します。
+    取得済みの記事ページのHTMLから、タイトル、情報源、掲載時刻、本文、ジャンル、IDを抽出します。
+    記事ページは必要な情報がすべてサーバー側で描画されているため、SeleniumではなくHTTPで取得したHTMLを使います。
     """
     try:
         print(f"[DEBUG] Extracting info from: {url}")
-        driver.get(url)
-        time.sleep(2) # ページが完全に読み込まれるのを待つ
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        trimmed_html = trim_article_html(html)
+        tree = LexborHTMLParser(trimmed_html)
+        # 切り捨て後のツリーに本文のコンテナがない場合は、念のため切り捨て前のHTMLでパースし直す
+        if trimmed_html is not html and not (tree.css_first(ARTICLE_BODY_SELECTOR) or tree.css_first(ARTICLE_BODY_FALLBACK_SELECTOR)):
+            print("[DEBUG] No article content container in trimmed HTML. Parsing the full HTML.")
+            tree = LexborHTMLParser(html)
+        nodes = scan_article_tree(tree)
 
         # 1. IDの抽出
-        # URLから直接記事IDを抽出
-        article_id_match = re.search(r'articles/([a-f0-9]+)', url)
-        article_id = article_id_match.group(1) if article_id_match else "NO_ID"
+        # URLから直接記事IDを抽出 (形式が https://news.yahoo.co.jp/articles/<ID> に固定されているため文字列操作で切り出す)
+        after_articles = url.rsplit("/articles/", 1)
+        article_id = after_articles[1].split("?", 1)[0].split("/", 1)[0] if len(after_articles) == 2 else ""
+        article_id = article_id or "NO_ID"
         print(f"[DEBUG] Article ID: {article_id}")
 
         # 2. タイトルの抽出
-        meta_title = soup.find("meta", property="og:title")
-        title = meta_title["content"].strip() if meta_title and meta_title.get("content") else "NO TITLE"
+        meta_title = nodes["og_title"]
+        title = meta_title.attributes["content"].strip() if meta_title and meta_title.attributes.get("content") else "NO TITLE"
         # 「（情報源） - Yahoo!ニュース」の部分を削除
-        title = re.sub(r'（.*?） - Yahoo!ニュース$', '', title).strip()
+        title = _TITLE_SUFFIX_RE.sub('', title).strip()
         print(f"[DEBUG] Title: {title}")
 
         # 3. 情報源の抽出 - 修正されたロジック
         provider = "不明" # Default
 
+        # ld+jsonは情報源と掲載時刻の両方に使うため、ここで一度だけデコードする
+        ld_json_items = parse_ld_json(nodes["ld_json_scripts"])
+
         # 1. ld+jsonのauthor.nameを最優先で試す
-        ld_json = soup.find("script", type="application/ld+json")
-        if ld_json:
-            try:
-                data = json.loads(ld_json.string)
-                if isinstance(data, dict):
-                    if "author" in data and "name" in data["author"]:
-                        provider = data["author"]["name"].strip()
-                        print(f"[DEBUG] Provider (ld+json author): {provider}")
-                    elif "publisher" in data and "name" in data["publisher"] and data["publisher"]["name"].strip() != "Yahoo!ニュース":
-                        # publisherがYahoo!ニュース以外なら採用
-                        provider = data["publisher"]["name"].strip()
-                        print(f"[DEBUG] Provider (ld+json publisher, non-Yahoo): {provider}")
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] Failed to parse ld+json for provider: {e}")
+        # ld+jsonは複数存在することがあるため、情報源が見つかった時点で走査を打ち切る
+        for data in ld_json_items:
+            author = data.get("author")
+            author_name = author.get("name") if isinstance(author, dict) else None
+            publisher = data.get("publisher")
+            publisher_name = publisher.get("name") if isinstance(publisher, dict) else None
+
+            if author_name:
+                provider = author_name.strip()
+                print(f"[DEBUG] Provider (ld+json author): {provider}")
+                break
+            if publisher_name and publisher_name.strip() != "Yahoo!ニュース":
+                # publisherがYahoo!ニュース以外なら採用
+                provider = publisher_name.strip()
+                print(f"[DEBUG] Provider (ld+json publisher, non-Yahoo): {provider}")
+                break
 
         # 2. ld+jsonで取得できなかった場合、metaタグのauthor/publisherを試す
         if provider == "不明":
-            meta_author = soup.find("meta", attrs={"name": re.compile("author|publisher", re.I)})
-            if meta_author and meta_author.get("content"):
-                provider = meta_author["content"].strip()
+            meta_author = nodes["author_meta"]
+            if meta_author and meta_author.attributes.get("content"):
+                provider = meta_author.attributes["content"].strip()
                 print(f"[DEBUG] Provider (meta_author): {provider}")
 
         # 3. それでも不明な場合、記事下部のプロバイダー情報を試す (元のコードから維持)
         if provider == "不明":
-            provider_span = soup.find("span", class_="sc-f06b9b1-0") # ニュース提供元のクラス名
+            provider_span = tree.css_first("span.sc-f06b9b1-0") # ニュース提供元のクラス名
             if provider_span:
-                provider = provider_span.get_text(strip=True)
+                provider = provider_span.text(strip=True)
                 print(f"[DEBUG] Provider (fallback span): {provider}")
 
         print(f"[DEBUG] Final Provider: {provider}")
@@ -129,101 +577,42 @@ def extract_article_info(driver, url):
 
         # 4. 掲載時刻の抽出
         pub_time = ""
-        time_tag = soup.find("time")
-        if time_tag and time_tag.has_attr('datetime'):
-            pub_time = time_tag['datetime'].strip()
-        elif time_tag:
-            pub_time = time_tag.get_text(strip=True)
+        # デコード済みのld+jsonのdatePublished (なければdateModified) を最優先で使う
+        for data in ld_json_items:
+            date_value = data.get("datePublished") or data.get("dateModified")
+            if isinstance(date_value, str) and date_value.strip():
+                pub_time = date_value.strip()
+                print(f"[DEBUG] Published Time (ld+json): {pub_time}")
+                break
+        # ld+jsonにない場合はtimeタグを使う
+        if not pub_time:
+            time_tag = nodes["time_tag"]
+            if time_tag and "datetime" in time_tag.attributes:
+                pub_time = (time_tag.attributes["datetime"] or "").strip()
+            elif time_tag:
+                pub_time = time_tag.text(strip=True)
         # Fallback to meta tag if time tag not found or empty
         if not pub_time:
-            meta_pubdate = soup.find("meta", attrs={"name": "pubdate"})
-            if meta_pubdate and meta_pubdate.get("content"):
-                pub_time = meta_pubdate["content"].strip()
+            meta_pubdate = nodes["pubdate_meta"]
+            if meta_pubdate and meta_pubdate.attributes.get("content"):
+                pub_time = meta_pubdate.attributes["content"].strip()
 
         print(f"[DEBUG] Published Time: {pub_time}")
 
         # 5. ジャンル（カテゴリ）の抽出
         genre = "その他" # デフォルトジャンル
-        # 主要カテゴリのマッピング辞書
-        CATEGORY_MAP = {
-            "dom": "国内",
-            "wor": "国際",
-            "bus": "経済",
-            "eco": "経済",
-            "ent": "エンタメ",
-            "spo": "スポーツ",
-            "it": "IT",
-            "sci": "科学",
-            "life": "ライフ",
-            "loc": "地域",
-            "main": "主要"
-        }
-
-        # サブカテゴリのマッピング辞書
-        SUBCATEGORY_MAP = {
-            "poli": "政治",
-            "soci": "社会",
-            "peo": "人", # 人物
-            "oversea": "国際総合", # URLで oversea が使われている場合
-            "chn": "中国・台湾",
-            "kor": "韓国・北朝鮮",
-            "asia": "アジア・オセアニア",
-            "na": "北米",
-            "ca": "中南米",
-            "eu": "ヨーロッパ",
-            "mea": "中東・アフリカ",
-            "biz": "経済総合", # URLで biz が使われている場合
-            "mkt": "市況",
-            "stk": "株式",
-            "ind": "産業",
-            "mus": "音楽",
-            "mov": "映画",
-            "game": "ゲーム",
-            "korasian": "アジア・韓流",
-            "base": "野球",
-            "soc": "サッカー",
-            "moto": "モータースポーツ",
-            "horse": "競馬",
-            "golf": "ゴルフ",
-            "fig": "格闘技",
-            "health": "ヘルス",
-            "env": "環境",
-            "art": "文化・アート",
-            "tohoku": "北海道・東北",
-            "kant": "関東",
-            "shinetu": "信越・北陸",
-            "tokai": "東海",
-            "kinki": "近畿",
-            "chugoku": "中国",
-            "shikoku": "四国",
-            "kushu": "九州・沖縄",
-            "itpro": "製品", # ITの製品カテゴリ
-            "it総合": "IT総合", # 明示的にIT総合とする場合
-            "sci総合": "科学総合", # 明示的に科学総合とする場合
-            "life総合": "ライフ総合", # 明示的にライフ総合とする場合
-            "ent総合": "エンタメ総合", # 明示的にエンタメ総合とする場合
-            "spo総合": "スポーツ総合", # 明示的にスポーツ総合とする場合
-            "dom総合": "国内総合", # 明示的に国内総合とする場合
-            "wor総合": "国際総合", # 明示的に国際総合とする場合
-            "eco総合": "経済総合", # 明示的に経済総合とする場合
-            "loc総合": "地域総合" # 明示的に地域総合とする場合
-        }
 
         # __PRELOADED_STATE__ からジャンルを抽出 (最優先)
-        preloaded_state_script_content = None
-        for script_tag in soup.find_all("script"):
-            if script_tag.string and 'window.__PRELOADED_STATE__ =' in script_tag.string:
-                preloaded_state_script_content = script_tag.string
-                break
+        preloaded_state_script_content = extract_preloaded_state(html)
 
         if preloaded_state_script_content:
             json_start = preloaded_state_script_content.find('{')
-            json_end = preloaded_state_script_content.rfind('}')
+            json_end = find_json_object_end(preloaded_state_script_content, json_start) if json_start != -1 else -1
 
             if json_start != -1 and json_end != -1 and json_end > json_start:
                 json_str = preloaded_state_script_content[json_start : json_end + 1].strip()
                 try:
-                    state_data = json.loads(json_str)
+                    state_data = orjson.loads(json_str)
                     
                     main_category_short = state_data.get('articleDetail', {}).get('categoryShortName')
                     sub_category_short = state_data.get('articleDetail', {}).get('subCategory')
@@ -274,7 +663,7 @@ def extract_article_info(driver, url):
 
                     print(f"[DEBUG] Extracted genre from __PRELOADED_STATE__: {genre} (main short name: {main_category_short}, sub short name: {sub_category_short})")
 
-                except json.JSONDecodeError as e:
+                except orjson.JSONDecodeError as e:
                     print(f"[DEBUG] Failed to parse __PRELOADED_STATE__ JSON: {e}")
                     print(f"[DEBUG] JSON string that caused error (first 200 chars): {json_str[:200]}...")
                 except Exception as e:
@@ -282,79 +671,91 @@ def extract_article_info(driver, url):
             else:
                 print("[DEBUG] Could not find balanced JSON object within __PRELOADED_STATE__ content.")
         else:
-            print("[DEBUG] __PRELOADED_STATE__ script content not found in any script tag. Falling back to URL inference.")
+            print("[DEBUG] __PRELOADED_STATE__ script content not found in page. Falling back to URL inference.")
             # Fallback to URL inference if __PRELOADED_STATE__ is not found or parsed
-            found_by_url = False
-            for short_name, jp_name in SUBCATEGORY_MAP.items():
-                if f"/{short_name}" in url or f"ctg={short_name}" in url or f"genre={short_name}" in url:
-                    if f"/categories/domestic" in url and short_name == "soci":
-                        genre = "国内/社会"
-                    elif f"/articles/" in url and short_name in ["poli", "soci", "peo", "mus", "mov", "game", "base", "soc", "moto", "horse", "golf", "fig", "health", "env", "art", "biz", "mkt", "stk", "ind", "oversea", "chn", "kor", "asia", "na", "ca", "eu", "mea", "sports", "enter", "it", "sci", "itpro", "korasian"]:
-                        if "domestic" in url: genre_prefix = "国内/"
-                        elif "world" in url: genre_prefix = "国際/"
-                        elif "economy" in url: genre_prefix = "経済/"
-                        elif "entertainment" in url: genre_prefix = "エンタメ/"
-                        elif "sports" in url: genre_prefix = "スポーツ/"
-                        elif "it" in url: genre_prefix = "IT/"
-                        elif "science" in url: genre_prefix = "科学/"
-                        elif "life" in url: genre_prefix = "ライフ/"
-                        elif "local" in url: genre_prefix = "地域/"
-                        else: genre_prefix = ""
-                        
-                        if short_name == "it": genre = "IT"
-                        elif short_name == "sci": genre = "科学"
-                        else: genre = f"{genre_prefix}{jp_name}"
-                    else:
-                        genre = jp_name
-                    print(f"[DEBUG] Inferred genre from URL (subcategory priority): {genre}")
-                    found_by_url = True
-                    break
-            
-            if not found_by_url:
-                for short_name, jp_name in CATEGORY_MAP.items():
-                    if f"/categories/{short_name}" in url or f"ctg={short_name}" in url:
-                        if short_name == "it": genre = "IT"
-                        elif short_name == "sci": genre = "科学"
-                        elif short_name == "main": genre = "主要"
-                        else: genre = f"{jp_name}/{jp_name}総合"
-                        print(f"[DEBUG] Inferred genre from URL (main category fallback): {genre}")
-                        found_by_url = True
-                        break
-            
-            if not found_by_url:
-                genre = "その他"
+            genre = infer_genre_from_url(url) or "その他"
+            print(f"[DEBUG] Inferred genre from URL: {genre}")
 
         print(f"[DEBUG] Final genre before return: {genre}")
         # 6. 本文の抽出 (マルチページ対応を削除し、単一ページとして処理)
-        body = extract_body(soup)
+        body = extract_body(tree)
 
-        return article_id, title, provider, pub_time, body[:3000] if body else "", genre # 本文を3000文字に制限
+        return article_id, title, provider, pub_time, body, genre # 本文は extract_body で BODY_MAX_LENGTH 文字に制限済み
     except Exception as e:
         print(f"[ERROR] Failed to extract article info from {url}: {e}")
         return "ERROR", "ERROR", "ERROR", "ERROR", "", "ERROR" # エラー時には適切なデフォルト値を返す
 
+# --- 既存URLキャッシュ ---
+def load_existing_urls():
+    """
+    ローカルにキャッシュした書き込み済みURLのセットを読み込みます。
+    キャッシュがない、壊れている、または別のシート (SHEET_NAME が異なる) のものである場合はNoneを返し、
+    スプレッドシートからの読み込みに任せます。
+    """
+    try:
+        with open(EXISTING_URLS_CACHE, encoding="utf-8") as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError as e:
+        print(f"[DEBUG] Ignoring broken URL cache {EXISTING_URLS_CACHE}: {e}")
+        return None
+
+    if not isinstance(cache, dict) or cache.get("sheet") != SHEET_NAME or not isinstance(cache.get("urls"), list):
+        print(f"[INFO] Ignoring URL cache {EXISTING_URLS_CACHE}: it was not written for sheet '{SHEET_NAME}'.")
+        return None
+    return set(cache["urls"])
+
+def save_existing_urls(urls):
+    """
+    書き込み済みURLのセットを、対象のシート名と一緒にローカルにキャッシュします。
+    次回の実行ではスプレッドシート全体を読み込まずに済みます。
+    """
+    with open(EXISTING_URLS_CACHE, "w", encoding="utf-8") as f:
+        json.dump({"sheet": SHEET_NAME, "urls": sorted(urls)}, f, ensure_ascii=False)
+    print(f"[INFO] Saved {len(urls)} existing URLs to {EXISTING_URLS_CACHE}.")
+
 # --- スプレッドシートへ書き込み関数 ---
-def append_to_sheet(data, existing_urls):
+def open_sheet():
     """
-    収集したデータをGoogle Sheetsに追記します。
-    既存のURLを重複して書き込まないようにフィルタリングします。
+    Google Sheetsに認証し、書き込み先のシート（sheet1）を返します。
     """
-    print(f"[INFO] Writing {len(data)} new records to the sheet...")
-    # 認証情報を設定
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     creds = ServiceAccountCredentials.from_json_keyfile_name(SERVICE_ACCOUNT_FILE, scope)
     client = gspread.authorize(creds)
-    sheet = client.open(SHEET_NAME).sheet1
+    return client.open(SHEET_NAME).sheet1
+
+def is_sheet_initialized():
+    """
+    フラグファイルに記録されたシート名が SHEET_NAME と一致する場合のみ、ヘッダー行の挿入済みとみなします。
+    シート名を変更した場合は、新しいシートで改めてヘッダー行を確認します。
+    """
+    try:
+        with open(SHEET_INITIALIZED_FLAG, encoding="utf-8") as f:
+            return f.read().strip() == SHEET_NAME
+    except FileNotFoundError:
+        return False
+
+def append_to_sheet(data, existing_urls, sheet=None, header_present=False):
+    """
+    収集したデータをGoogle Sheetsに追記します。
+    既存のURLを重複して書き込まないようにフィルタリングします。
+    sheet にはメイン処理で取得済みのシートを渡し、認証とシート全体の再取得を省きます。
+    header_present がTrueの場合 (既存の記事行がある場合など) はヘッダー行の確認を省きます。
+    """
+    print(f"[INFO] Writing {len(data)} new records to the sheet...")
+    if sheet is None:
+        sheet = open_sheet()
 
     # ヘッダー行が存在しない場合に挿入
-    existing = sheet.get_all_values()
-    if not existing:
-        headers = ["ID", "収集時刻", "タイトル", "情報源", "掲載時刻", "URL", "ジャンル", "本文"]
-        sheet.append_row(headers)
-        print("[INFO] Header row inserted.")
-        # ヘッダー追加後、再度既存データを取得して existing_urls を更新
-        existing = sheet.get_all_values()
-        existing_urls = {row[5] for row in existing[1:] if len(row) > 5}
+    # 同じシートの初期化済みフラグファイルがあれば確認自体を省き、なければA1セルだけを取得して確認する
+    if not header_present and not is_sheet_initialized():
+        if not sheet.acell("A1").value:
+            headers = ["ID", "収集時刻", "タイトル", "情報源", "掲載時刻", "URL", "ジャンル", "本文"]
+            sheet.append_row(headers)
+            print("[INFO] Header row inserted.")
+        with open(SHEET_INITIALIZED_FLAG, "w", encoding="utf-8") as f:
+            f.write(SHEET_NAME)
 
     # 新規URLのレコードのみフィルタリング
     new_rows = []
@@ -381,232 +782,122 @@ if __name__ == "__main__":
     # このwhile Trueループとtime.sleep(3600)は削除します。
     # GitHub Actionsのcronスケジュールがこの役割を担います。
     # while True: 
-    driver = None # 各実行の開始時にドライバーをNoneに初期化
+    sheet = None
+    existing_urls_loaded = False # 既存URLを正しく読み込めた場合のみキャッシュを更新する
     try:
-        driver = init_driver()
-
         jst = timezone(timedelta(hours=9))
         timestamp = datetime.now(jst).strftime("%Y/%m/%d %H:%M")
 
-        # --- カテゴリ優先度設定 ---
-        # 国内および地域のカテゴリ・サブカテゴリは優先度0
-        # その他すべてのカテゴリ・サブカテゴリは優先度1（同率）
-        CATEGORY_PRIORITY = {
-            "国内": 0,
-            "国内総合": 0,
-            "国内/国内総合": 0,
-            "国内/政治": 0,
-            "国内/社会": 0,
-            "国内/人": 0,
-            "地域": 0,
-            "地域/地域総合": 0,
-            "地域総合": 0,
-            "地域/北海道・東北": 0,
-            "地域/関東": 0,
-            "地域/信越・北陸": 0,
-            "地域/東海": 0,
-            "地域/近畿": 0,
-            "地域/中国": 0,
-            "地域/四国": 0,
-            "地域/九州・沖縄": 0,
-            
-            # それ以外のすべてのカテゴリとサブカテゴリは優先度1
-            "主要": 1,
-            "その他": 1,
-
-            "国際": 1,
-            "国際総合": 1,
-            "国際/国際総合": 1,
-            "国際/国際総合": 1,
-            "国際/中国・台湾": 1,
-            "国際/韓国・北朝鮮": 1,
-            "国際/アジア・オセアニア": 1,
-            "国際/北米": 1,
-            "国際/中南米": 1,
-            "国際/ヨーロッパ": 1,
-            "国際/中東・アフリカ": 1,
-
-            "経済": 1,
-            "経済総合": 1,
-            "経済/経済総合": 1,
-            "経済/市況": 1,
-            "経済/株式": 1,
-            "経済/産業": 1,
-
-            "エンタメ": 1,
-            "エンタメ/エンタメ総合": 1,
-            "エンタメ総合": 1,
-            "エンタメ/音楽": 1,
-            "エンタメ/映画": 1,
-            "エンタメ/ゲーム": 1,
-            "エンタメ/アジア・韓流": 1,
-
-            "スポーツ": 1,
-            "スポーツ総合": 1,
-            "スポーツ/スポーツ総合": 1,
-            "sports/野球": 1,
-            "スポーツ/サッカー": 1,
-            "スポーツ/モータースポーツ": 1,
-            "スポーツ/競馬": 1,
-            "スポーツ/ゴルフ": 1,
-            "スポーツ/格闘技": 1,
-
-            "IT": 1,
-            "IT/IT総合": 1,
-            "IT総合": 1,
-            "IT/製品": 1,
-
-            "科学": 1,
-            "科学/科学総合": 1,
-            "科学総合": 1,
-            
-            "ライフ": 1,
-            "ライフ/ライフ総合": 1,
-            "ライフ総合": 1,
-            "ライフ/ヘルス": 1,
-            "ライフ/環境": 1,
-            "ライフ/文化・アート": 1,
-        }
-
-
-        category_urls = {
-            "国内": "https://news.yahoo.co.jp/categories/domestic",
-            "国際": "https://news.yahoo.co.jp/categories/world",
-            "経済": "https://news.yahoo.co.jp/categories/economy",
-            "エンタメ": "https://news.yahoo.co.jp/categories/entertainment",
-            "スポーツ": "https://news.yahoo.co.jp/categories/sports",
-            "IT": "https://news.yahoo.co.jp/categories/it",
-            "科学": "https://news.yahoo.co.jp/categories/science",
-            "ライフ": "https://news.yahoo.co.jp/categories/life",
-            "地域": "https://news.yahoo.co.jp/categories/local",
-            "主要": "https://news.yahoo.co.jp/"
-        }
-
         # すべての記事を一時的に保持する辞書。key: URL, value: [article_id, collected_at, title, provider, pub_time, url, genre, body]
-        # 同じURLでより優先度の高いジャンルが見つかった場合、この辞書のエントリを更新する
+        # 各URLは一度だけ取得し、ジャンルは記事ページ自体から抽出するため、登録後に更新することはない
         temp_article_storage = {}
         
-        # 既存URLのセットをスプレッドシートから読み込む
-        try:
-            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(SERVICE_ACCOUNT_FILE, scope)
-            client = gspread.authorize(creds)
-            sheet = client.open(SHEET_NAME).sheet1
-            existing_urls_on_sheet = {row[5] for row in sheet.get_all_values()[1:] if len(row) > 5}
-            print(f"[INFO] Fetched {len(existing_urls_on_sheet)} existing URLs from the sheet.")
-        except Exception as e:
-            print(f"[ERROR] Could not connect to Google Sheet or fetch existing URLs: {e}")
-            existing_urls_on_sheet = set() # エラー時は空のセットで続行
+        # 既存URLのセットを読み込む (ローカルキャッシュを優先し、なければスプレッドシートから)
+        existing_urls_on_sheet = load_existing_urls()
+        if existing_urls_on_sheet is not None:
+            existing_urls_loaded = True
+            print(f"[INFO] Loaded {len(existing_urls_on_sheet)} existing URLs from {EXISTING_URLS_CACHE}.")
+        else:
+            try:
+                sheet = open_sheet()
+                # URL列 (F列) だけを取得し、シート全体のダウンロードを避ける
+                existing_urls_on_sheet = {url for url in sheet.col_values(6)[1:] if url}
+                existing_urls_loaded = True
+                print(f"[INFO] Fetched {len(existing_urls_on_sheet)} existing URLs from the sheet.")
+            except Exception as e:
+                print(f"[ERROR] Could not connect to Google Sheet or fetch existing URLs: {e}")
+                sheet = None # 書き込み時に再接続を試みる
+                existing_urls_on_sheet = set() # エラー時は空のセットで続行
 
         total_skipped = 0
         total_added = 0
-        total_updated_genre = 0 # ジャンルが更新された記事の数
 
-        for category_name, base_url in category_urls.items():
-            print(f"\n--- Scraping Category: {category_name} ({base_url}) ---")
-            driver.get(base_url)
-            time.sleep(3) # 各カテゴリページ読み込み時の待機
-
-            # 各カテゴリで「もっと見る」のクリック回数を減らす
-            # アカウント停止リスクを減らすため、1回または0回にするのも有効
-            # Yahoo!ニュースは新しい記事が比較的頻繁に出るので、少なめでも良いかも
-            for i in range(1): # 例: 1回だけクリック (デフォルトは3回から変更)
-                try:
-                    more_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'もっと見る')]"))
-                    )
-                    driver.execute_script("arguments[0].click();", more_button)
-                    print(f"[DEBUG] Clicked 'もっと見る' button {i+1} times in {category_name}.")
-                    time.sleep(2) # 新しい記事が読み込まれるのを待つ
-                except Exception:
-                    print(f"[INFO] No more 'もっと見る' button or reached limit in {category_name}.")
-                    break
-            
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            article_links = soup.select("a[href^='https://news.yahoo.co.jp/articles/']")
-            print(f"[DEBUG] Found {len(article_links)} article links in {category_name}.")
-            
-            for a in article_links:
-                article_url = a["href"].split("?")[0]
-                
-                # 既存スプレッドシートにある場合はスキップ（初回追加はしない）
-                if article_url in existing_urls_on_sheet:
-                    total_skipped += 1
-                    continue
-                
-                # 記事情報の抽出
-                article_id, title, provider, pub_time, body, genre = extract_article_info(driver, article_url)
-
-                if title == "ERROR" or not body:
-                    print(f"[SKIP] Invalid content or error occurred for: {article_url}")
-                    total_skipped += 1
-                    continue
-
-                current_article_data = [
-                    article_id,
-                    timestamp,
-                    title,
-                    provider,
-                    pub_time,
-                    article_url,
-                    genre, # ここで取得されたジャンル
-                    body
-                ]
-
-                # 収集済みリスト（temp_article_storage）に既に存在するか確認
-                if article_url in temp_article_storage:
-                    existing_genre = temp_article_storage[article_url][6] # 既存のジャンル
-                    
-                    # ジャンルを特定できない場合のデフォルト値を考慮
-                    existing_priority = CATEGORY_PRIORITY.get(existing_genre, 0) # 辞書にない場合は0（最低）
-                    new_priority = CATEGORY_PRIORITY.get(genre, 0) # 辞書にない場合は0（最低）
-
-                    # 新しいジャンルが既存のジャンルよりも優先度が高い場合、または同じ優先度でより詳細な場合
-                    if new_priority > existing_priority:
-                        temp_article_storage[article_url] = current_article_data
-                        total_updated_genre += 1
-                        print(f"[UPDATE] Genre updated for {article_id}: From '{existing_genre}' (Priority {existing_priority}) to '{genre}' (Priority {new_priority})")
-                    elif new_priority == existing_priority and len(genre) > len(existing_genre):
-                        # 同じ優先度でも、より詳細なジャンル名（例: 国内総合 -> 国内/社会）を優先
-                        temp_article_storage[article_url] = current_article_data
-                        total_updated_genre += 1
-                        print(f"[UPDATE] Genre updated for {article_id}: From '{existing_genre}' to '{genre}' (more detailed)")
-                else:
-                    # 初めて見つかった記事
-                    temp_article_storage[article_url] = current_article_data
-                    total_added += 1
-                    print(f"[ADD] {title} (ID: {article_id}) - Genre: {genre}")
-        
-        # この try-except ブロックの最後で driver を終了させます。
-        # 各カテゴリのスクレイピングが終わるたびにdriver.quit()を呼び出すのは効率が悪いので、
-        # 全てのカテゴリを回った後、メインループの最後に移します。
-        # driver.quit() は最後に一回だけ実行するのが一般的です。
+        # --- 1. 全カテゴリの記事URLを収集 ---
+        # 複数のカテゴリに掲載される記事も多いため、記事ページの取得前にURLを全カテゴリで重複排除する
+        # key: 記事URL, value: 最初に見つかったカテゴリ名
+        discovered_urls = {}
+        # カテゴリページは互いに独立しているため、複数のWebDriverで並列に取得する
+        # 結果はカテゴリの定義順に取り込み、「最初に見つかったカテゴリ」が実行ごとに変わらないようにする
+        with ThreadPoolExecutor(max_workers=MAX_CATEGORY_WORKERS) as executor:
+            futures = [
+                (category_name, executor.submit(scrape_category, category_name, base_url))
+                for category_name, base_url in CATEGORY_URLS.items()
+            ]
+            for category_name, future in futures:
+                for article_url in future.result():
+                    discovered_urls.setdefault(article_url, category_name)
+        # 記事ページの取得にはWebDriverを使わないため、この時点で終了させてメモリを解放する
+        quit_worker_drivers()
+
+        print(f"\n[INFO] Discovered {len(discovered_urls)} unique article URLs across all categories.")
+
+        # --- 2. 新規の記事ページを一括取得して情報を抽出 ---
+        # 既存スプレッドシートにあるURLは取得前にまとめて除外する（初回追加はしない）
+        # discovered_urls は全カテゴリで重複排除済みのため、これ以降の重複チェックは不要
+        urls_to_fetch = [article_url for article_url in discovered_urls if article_url not in existing_urls_on_sheet]
+        total_skipped += len(discovered_urls) - len(urls_to_fetch)
+        print(f"[INFO] {len(urls_to_fetch)} new article URLs to fetch ({len(discovered_urls) - len(urls_to_fetch)} already in sheet).")
+
+        # 記事ページの取得と記事情報の抽出 (aiohttpで並行に処理)
+        # 新規URLがない場合 (定期実行ではよくある) はHTTPセッション自体を作らない
+        article_infos = asyncio.run(fetch_all_articles(urls_to_fetch)) if urls_to_fetch else []
+
+        for article_url, article_info in zip(urls_to_fetch, article_infos):
+            if article_info is None:
+                print(f"[SKIP] Failed to fetch: {article_url}")
+                total_skipped += 1
+                continue
+            if isinstance(article_info, Exception):
+                print(f"[SKIP] Unexpected error while fetching or parsing {article_url}: {article_info}")
+                total_skipped += 1
+                continue
+
+            article_id, title, provider, pub_time, body, genre = article_info
+
+            if title == "ERROR" or not body:
+                print(f"[SKIP] Invalid content or error occurred for: {article_url}")
+                total_skipped += 1
+                continue
+
+            current_article_data = [
+                article_id,
+                timestamp,
+                title,
+                provider,
+                pub_time,
+                article_url,
+                genre, # ここで取得されたジャンル
+                body
+            ]
+
+            temp_article_storage[article_url] = current_article_data
+            total_added += 1
+            print(f"[ADD] {title} (ID: {article_id}) - Genre: {genre} (found in {discovered_urls[article_url]})")
 
     except Exception as main_e:
         print(f"[CRITICAL ERROR] An error occurred during the scraping process: {main_e}")
     finally: # エラーの有無にかかわらず、最後にドライバーを終了させる
-        if driver:
-            driver.quit()
-            print("[INFO] WebDriver closed.")
+        quit_worker_drivers()
 
-    # temp_article_storageから、新規追加すべきレコードを抽出
-    # スプレッドシートに書き込む前に、再度重複チェックを行う（念のため）
-    final_data_to_write = []
-    for url, data in temp_article_storage.items():
-        if url not in existing_urls_on_sheet:
-            final_data_to_write.append(data)
+    # temp_article_storageには取得前に既存URLを除外した記事だけが入っているため、そのまま書き込み対象とする
+    final_data_to_write = list(temp_article_storage.values())
 
     if final_data_to_write:
-        append_to_sheet(final_data_to_write, existing_urls_on_sheet)
+        # 既存の記事行があればヘッダー行も存在するため、確認のためのAPI呼び出しを省く
+        header_present = bool(existing_urls_on_sheet)
+        append_to_sheet(final_data_to_write, existing_urls_on_sheet, sheet, header_present)
         # スプレッドシートに書き込んだら、既存URLリストを更新
         # 次の実行時には、この新しいURLもスキップ対象になる
         existing_urls_on_sheet.update({row[5] for row in final_data_to_write}) 
     else:
-        print("[INFO] No new unique articles to write across all categories after priority sorting.")
+        print("[INFO] No new unique articles to write across all categories.")
+
+    # 既存URLの読み込みに失敗した場合は、不完全なセットでキャッシュを上書きしない
+    if existing_urls_loaded:
+        save_existing_urls(existing_urls_on_sheet)
 
     print(f"[REPORT] Total Skipped (already in sheet): {total_skipped}")
     print(f"[REPORT] Total Added (new unique articles): {total_added}")
-    print(f"[REPORT] Total Genre Updated (higher priority): {total_updated_genre}")
     print("[END] Yahoo News scraping finished this cycle.")
 
     # GitHub Actionsのcronスケジュールが次の実行をトリガーするため、